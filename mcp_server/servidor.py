@@ -7,6 +7,9 @@ from fastmcp import FastMCP
 # Esto es clave para que MCP pueda encontrar las funciones referenciadas
 # en los archivos YAML (ej. 'datastage.dsjob_command').
 from .utilidades import datastage
+from .utilidades import inventory
+from .utilidades.admission import with_deadline
+from .utilidades.config import datastage_config
 
 def load_tools_from_directory(directory: str) -> list[dict]:
     tools_data = []
@@ -27,6 +30,8 @@ def load_tools_from_directory(directory: str) -> list[dict]:
                 func = None
                 if module_name == "datastage":
                     func = getattr(datastage, function_name)
+                elif module_name == "inventory":
+                    func = getattr(inventory, function_name)
                 else:
                     # Fallback for other modules if they are added later
                     module = importlib.import_module(module_name)
@@ -70,8 +75,12 @@ def create_mcp_server():
     tools_to_add = load_tools_from_directory(herramientas_dir)
 
     # 4. Registrar cada herramienta cargada en el servidor usando el decorador dinámicamente.
+    #    Cada llamada recibe un plazo que comparten todos los comandos de DataStage que ejecute,
+    #    y su resultado se marca con [STALE] si se construyó con datos de la caché.
     for tool_data in tools_to_add:
-        mcp.tool(name=tool_data["name"], description=tool_data["description"])(tool_data["func"])
+        func = datastage.with_stale_notice(tool_data["func"])
+        func = with_deadline(func, datastage_config.REQUEST_TIMEOUT)
+        mcp.tool(name=tool_data["name"], description=tool_data["description"])(func)
 
 
     print(f"Servidor MCP '{mcp.name}' inicializado.")
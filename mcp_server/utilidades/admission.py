@@ -0,0 +1,249 @@
+import contextlib
+import contextvars
+import functools
+import subprocess
+import threading
+import time
+
+from .config import datastage_config
+
+class AdmissionRejected(Exception):
+    """Raised when a DataStage command is not admitted (shed, breaker open or deadline exhausted)."""
+    pass
+
+# Absolute deadline (time.monotonic()) of the MCP request being served, if any.
+_deadline = contextvars.ContextVar("datastage_deadline", default=None)
+
+@contextlib.contextmanager
+def deadline(seconds: float):
+    """
+    Sets a deadline for every DataStage command issued inside the block.
+    A nested deadline can shorten the caller's deadline but never extend it.
+    """
+    new_deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        new_deadline = min(new_deadline, current)
+    token = _deadline.set(new_deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining() -> float | None:
+    """Returns the seconds left before the current deadline, or None if there is no deadline."""
+    current = _deadline.get()
+    if current is None:
+        return None
+    return current - time.monotonic()
+
+def with_deadline(func, seconds: float):
+    """Wraps an MCP tool so that every command it runs shares a single deadline."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with deadline(seconds):
+            return func(*args, **kwargs)
+    return wrapper
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for DataStage commands.
+
+    The limit grows by roughly one slot per window of commands that finish under
+    the target latency and is halved when a command is slow or times out. Callers
+    beyond the limit wait in a bounded queue; once the queue is full they are shed.
+    """
+
+    def __init__(self, min_limit: int, max_limit: int, target_latency: float, max_queue: int):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.target_latency = target_latency
+        self.max_queue = max_queue
+        self._limit = float(max(self.min_limit, self.max_limit // 2))
+        self._in_flight = 0
+        self._waiting = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self, timeout: float | None = None):
+        with self._cond:
+            if self._waiting == 0 and self._in_flight < int(self._limit):
+                self._in_flight += 1
+                return
+            if self._waiting >= self.max_queue:
+                raise AdmissionRejected(
+                    f"queue full ({self._waiting} waiting, {self._in_flight} running)"
+                )
+            self._waiting += 1
+            try:
+                end = None if timeout is None else time.monotonic() + timeout
+                while self._in_flight >= int(self._limit):
+                    wait = None if end is None else end - time.monotonic()
+                    if wait is not None and wait <= 0:
+                        raise AdmissionRejected("deadline exceeded while queued")
+                    self._cond.wait(wait)
+            finally:
+                self._waiting -= 1
+            self._in_flight += 1
+
+    def release(self, latency: float | None, overloaded: bool = False):
+        """Frees a slot; latency None means the command says nothing about the engine."""
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if latency is None:
+                pass
+            elif overloaded or latency > self.target_latency:
+                # Only back off once per target-latency window so that a burst of
+                # slow commands started under the old limit does not collapse it.
+                if now - self._last_decrease >= self.target_latency:
+                    self._limit = max(float(self.min_limit), self._limit / 2)
+                    self._last_decrease = now
+            else:
+                self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+            self._cond.notify_all()
+
+class CircuitBreaker:
+    """
+    Stops sending commands to an engine that keeps timing out or refusing connections.
+
+    After failure_threshold consecutive failures the breaker opens and rejects
+    commands for reset_timeout seconds; then a single probe is let through and its
+    outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            # Half open: one probe at a time. A probe that ends without an outcome
+            # is abandoned by the caller; one that never returns expires after reset_timeout.
+            if self._probe_started is None or now - self._probe_started >= self.reset_timeout:
+                self._probe_started = now
+                return True
+            return False
+
+    def abandon_probe(self):
+        """Clears the half-open probe when it ended without an engine outcome."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_started = None
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+
+class AdmissionController:
+    """Admission control in front of every DataStage CLI call."""
+
+    def __init__(self, limiter: AdaptiveLimiter, breaker: CircuitBreaker, command_timeout: float):
+        self.limiter = limiter
+        self.breaker = breaker
+        self.command_timeout = command_timeout
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            AdaptiveLimiter(
+                config.MIN_CONCURRENCY,
+                config.MAX_CONCURRENCY,
+                config.TARGET_LATENCY,
+                config.MAX_QUEUE,
+            ),
+            CircuitBreaker(config.BREAKER_FAILURES, config.BREAKER_RESET),
+            config.COMMAND_TIMEOUT,
+        )
+
+    def call(self, func, is_failure=None):
+        """
+        Runs func(timeout) once admitted and returns its result.
+
+        The timeout passed to func is the command timeout capped by the current
+        deadline. subprocess.TimeoutExpired counts as an engine failure only when
+        the full command timeout ran out; a timeout cut short by the caller's
+        deadline says nothing about the engine. A completed command counts as an
+        engine failure when is_failure(result) is true (e.g. connection refused),
+        otherwise as a success, even with a non-zero exit code.
+        """
+        if not self.breaker.allow():
+            raise AdmissionRejected("circuit breaker open, DataStage engine is unhealthy")
+        reported = False
+        try:
+            budget = remaining()
+            if budget is not None and budget <= 0:
+                raise AdmissionRejected("deadline exceeded")
+            self.limiter.acquire(budget)
+
+            timeout = self.command_timeout
+            budget = remaining()
+            if budget is not None and budget < timeout:
+                if budget <= 0:
+                    self.limiter.release(None)
+                    raise AdmissionRejected("deadline exceeded")
+                timeout = budget
+            capped = timeout < self.command_timeout
+            started = time.monotonic()
+            try:
+                result = func(timeout)
+            except subprocess.TimeoutExpired:
+                if capped:
+                    self.limiter.release(None)
+                else:
+                    self.limiter.release(time.monotonic() - started, overloaded=True)
+                    self.breaker.record_failure()
+                    reported = True
+                raise
+            except BaseException:
+                self.limiter.release(time.monotonic() - started)
+                raise
+            self.limiter.release(time.monotonic() - started)
+            if is_failure is not None and is_failure(result):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            reported = True
+            return result
+        finally:
+            # A half-open probe that was shed, hit its deadline or failed locally
+            # says nothing about the engine: let the next command probe instead.
+            if not reported:
+                self.breaker.abandon_probe()
+
+# Instancia compartida por todos los comandos de DataStage
+admission_controller = AdmissionController.from_config(datastage_config)
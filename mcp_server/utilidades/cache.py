@@ -37,6 +37,18 @@ def get_from_cache(key):
             return json.loads(data)
     return None
 
+def get_cache_entry(key):
+    """Returns (data, timestamp) for key regardless of its age, or None if missing."""
+    conn = _get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT data, timestamp FROM job_cache WHERE key = ?", (key,))
+    row = cursor.fetchone()
+    conn.close()
+
+    if row:
+        return json.loads(row['data']), row['timestamp']
+    return None
+
 def set_cache(key, data):
     conn = _get_db_connection()
     cursor = conn.cursor()
@@ -11,5 +11,15 @@ class DataStageConfig:
     SERVER = os.getenv("DATASTAGE_SERVER")
     PROJECT = os.getenv("DATASTAGE_PROJECT")
 
+    # Control de admision de los comandos de DataStage (ver admission.py).
+    COMMAND_TIMEOUT = float(os.getenv("DATASTAGE_COMMAND_TIMEOUT", "120"))
+    REQUEST_TIMEOUT = float(os.getenv("DATASTAGE_REQUEST_TIMEOUT", "300"))
+    MIN_CONCURRENCY = int(os.getenv("DATASTAGE_MIN_CONCURRENCY", "1"))
+    MAX_CONCURRENCY = int(os.getenv("DATASTAGE_MAX_CONCURRENCY", "16"))
+    TARGET_LATENCY = float(os.getenv("DATASTAGE_TARGET_LATENCY", "10"))
+    MAX_QUEUE = int(os.getenv("DATASTAGE_MAX_QUEUE", "32"))
+    BREAKER_FAILURES = int(os.getenv("DATASTAGE_BREAKER_FAILURES", "5"))
+    BREAKER_RESET = float(os.getenv("DATASTAGE_BREAKER_RESET", "60"))
+
 # Instancia de configuración para fácil acceso
 datastage_config = DataStageConfig()
@@ -1,35 +1,156 @@
+import contextlib
+import contextvars
+import functools
 import subprocess
 import json
+import time
 from .config import datastage_config # Import the configuration
-from .cache import get_from_cache, set_cache, generate_cache_key, init_cache_db # Import caching utilities
+from .cache import get_from_cache, set_cache, get_cache_entry, generate_cache_key, init_cache_db # Import caching utilities
+from .admission import admission_controller, AdmissionRejected # Import admission control
 
 class DataStageError(Exception):
     """Custom exception for DataStage command errors."""
     pass
 
-def _run_datastage_command(command_args):
-    """Helper function to run DataStage commands."""
+def _format_command(command_args):
+    """Renders a command for error messages without exposing the password."""
+    shown = []
+    for i, arg in enumerate(command_args):
+        if i > 0 and command_args[i - 1] == "-password":
+            arg = "****"
+        elif isinstance(arg, str) and arg.startswith("/P="):
+            arg = "/P=****"
+        shown.append(str(arg))
+    return ' '.join(shown)
+
+# Output of a failed dsjob/dssearch call that means the engine itself is unavailable,
+# as opposed to a bad request (unknown job, invalid parameter, ...).
+ENGINE_UNAVAILABLE_PATTERNS = (
+    "unable to connect",
+    "could not connect",
+    "connection refused",
+    "connection reset",
+    "connection timed out",
+    "failed to connect",
+    "no route to host",
+    "service unavailable",
+    "server is not available",
+)
+
+def _engine_unavailable(result):
+    """True if a completed command failed because the engine could not be reached."""
+    if result.returncode == 0:
+        return False
+    output = f"{result.stdout}\n{result.stderr}".lower()
+    return any(pattern in output for pattern in ENGINE_UNAVAILABLE_PATTERNS)
+
+# False while running code that must never receive cached output (see fresh_only).
+_allow_stale = contextvars.ContextVar("datastage_allow_stale", default=True)
+
+@contextlib.contextmanager
+def fresh_only():
+    """Makes commands issued inside the block raise DataStageError instead of serving cached output."""
+    token = _allow_stale.set(False)
     try:
-        result = subprocess.run(
+        yield
+    finally:
+        _allow_stale.reset(token)
+
+# Notices for the cached results served inside the current track_stale block.
+_stale_notices = contextvars.ContextVar("datastage_stale_notices", default=None)
+
+@contextlib.contextmanager
+def track_stale():
+    """
+    Collects a notice for every cached result served inside the block.
+    Notices are also passed on to any enclosing track_stale block.
+    """
+    notices = []
+    token = _stale_notices.set(notices)
+    try:
+        yield notices
+    finally:
+        _stale_notices.reset(token)
+        parent = _stale_notices.get()
+        if parent is not None:
+            parent.extend(notices)
+
+def with_stale_notice(func):
+    """Wraps an MCP tool so that a result built from cached output starts with [STALE] lines."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with track_stale() as notices:
+            result = func(*args, **kwargs)
+        if notices:
+            return "\n".join(f"[STALE] {notice}" for notice in notices) + "\n" + result
+        return result
+    return wrapper
+
+def _serve_stale(cache_key, command_args, reason):
+    """
+    Returns the last known output of a command unchanged, or raises DataStageError
+    if there is none. Staleness is reported through track_stale, not in the output.
+    """
+    if cache_key is not None and _allow_stale.get():
+        entry = get_cache_entry(cache_key)
+        if entry is not None:
+            cached_output, timestamp = entry
+            notices = _stale_notices.get()
+            if notices is not None:
+                age = int(time.time() - timestamp)
+                notices.append(
+                    f"DataStage command not executed ({reason}); "
+                    f"using cached result from {age}s ago."
+                )
+            return cached_output
+    raise DataStageError(
+        f"DataStage command not executed ({reason}) and no cached result is available.\n"
+        f"Command: {_format_command(command_args)}"
+    )
+
+def _run_datastage_command(command_args, cacheable=False):
+    """
+    Helper function to run DataStage commands.
+
+    Every command goes through the admission controller (adaptive concurrency,
+    bounded queue, request deadline and circuit breaker). The output of cacheable
+    (read-only) commands is stored so it can be served while the engine is
+    unhealthy (see track_stale). Commands with side effects must not be cacheable.
+    """
+    cache_key = generate_cache_key("_run_datastage_command", command_args) if cacheable else None
+    try:
+        result = admission_controller.call(lambda timeout: subprocess.run(
             command_args,
             capture_output=True,
             text=True,
-            check=False, # Raise an exception for non-zero exit codes
-            encoding='utf-8'
-        )
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        raise DataStageError(
-            f"DataStage command failed with exit code {e.returncode}:\n"
-            f"Command: {' '.join(e.cmd)}\n"
-            f"Stdout: {e.stdout.strip()}\n"
-            f"Stderr: {e.stderr.strip()}"
-        ) from e
+            check=False, # Non-zero exit codes are reported below
+            encoding='utf-8',
+            timeout=timeout
+        ), is_failure=_engine_unavailable)
+    except AdmissionRejected as e:
+        return _serve_stale(cache_key, command_args, str(e))
+    except subprocess.TimeoutExpired as e:
+        return _serve_stale(cache_key, command_args, f"timed out after {e.timeout:.1f}s")
     except FileNotFoundError:
         raise DataStageError(
             f"DataStage command not found. Ensure DataStage client is installed and in PATH. "
-            f"Attempted command: {' '.join(command_args)}"
+            f"Attempted command: {_format_command(command_args)}"
+        )
+
+    # Only read-only commands fall back to the cache; for the rest the real output is reported
+    if cacheable and _engine_unavailable(result):
+        return _serve_stale(cache_key, command_args, f"engine unavailable, exit code {result.returncode}")
+    if result.returncode != 0:
+        raise DataStageError(
+            f"DataStage command failed with exit code {result.returncode}:\n"
+            f"Command: {_format_command(command_args)}\n"
+            f"Stdout: {result.stdout.strip()}\n"
+            f"Stderr: {result.stderr.strip()}"
         )
+    output = result.stdout.strip()
+    if cacheable:
+        set_cache(cache_key, output)
+    return output
 
 def dsjob_command(job_name: str, command: str, project: str = None, args: list = None) -> str:
     """
@@ -112,15 +233,16 @@ def dssearch_command(search_string: str, project: str = None, object_type: str =
         return cached_result
 
     try:
-        jobs_output = _run_datastage_command([
-            "dsjob",
-            "-domain", datastage_config.DOMAIN,
-            "-server", datastage_config.SERVER,
-            "-user", datastage_config.USER,
-            "-password", datastage_config.PASSWORD,
-            "-ljobs",
-            project
-        ])
+        with track_stale() as stale_notices:
+            jobs_output = _run_datastage_command([
+                "dsjob",
+                "-domain", datastage_config.DOMAIN,
+                "-server", datastage_config.SERVER,
+                "-user", datastage_config.USER,
+                "-password", datastage_config.PASSWORD,
+                "-ljobs",
+                project
+            ], cacheable=True)
         all_jobs = [job.strip() for job in jobs_output.split('\n') if job.strip()]
 
         found_objects = []
@@ -133,7 +255,8 @@ def dssearch_command(search_string: str, project: str = None, object_type: str =
             found_objects = [obj for obj in found_objects if obj["type"].lower() == object_type.lower()]
 
         result_json = json.dumps(found_objects, indent=2)
-        set_cache(cache_key, result_json)
+        if not stale_notices: # Results built from stale output must not be cached as fresh
+            set_cache(cache_key, result_json)
         return result_json
 
     except DataStageError as e:
@@ -166,7 +289,7 @@ def get_projects() -> str:
         "-password", datastage_config.PASSWORD,
         "-lprojects"
     ]
-    projects_output = _run_datastage_command(cmd)
+    projects_output = _run_datastage_command(cmd, cacheable=True)
     all_projects = [project.strip() for project in projects_output.split('\n') if project.strip()]
     print(all_projects)
     return json.dumps(all_projects)
@@ -185,7 +308,7 @@ def get_jobs(project: str = None) -> str:
         "-ljobs",
         project
     ]
-    jobs_output = _run_datastage_command(cmd)
+    jobs_output = _run_datastage_command(cmd, cacheable=True)
     all_jobs = [job.strip() for job in jobs_output.split('\n') if job.strip()]
     return json.dumps(all_jobs)
 
@@ -203,7 +326,7 @@ def get_jobs_with_status(project: str, status: str) -> str:
         "-status", status,
         project
     ]
-    jobs_output = _run_datastage_command(cmd)
+    jobs_output = _run_datastage_command(cmd, cacheable=True)
     all_jobs = [job.strip() for job in jobs_output.split('\n') if job.strip()]
     return json.dumps(all_jobs)
 
@@ -221,7 +344,7 @@ def get_stages(project: str, job: str) -> str:
         project,
         job
     ]
-    stages_output = _run_datastage_command(cmd)
+    stages_output = _run_datastage_command(cmd, cacheable=True)
     all_stages = [stage.strip() for stage in stages_output.split('\n') if stage.strip()]
     return json.dumps(all_stages)
 
@@ -240,7 +363,7 @@ def get_links(project: str, job: str, stage: str) -> str:
         job,
         stage
     ]
-    links_output = _run_datastage_command(cmd)
+    links_output = _run_datastage_command(cmd, cacheable=True)
     all_links = [link.strip() for link in links_output.split('\n') if link.strip()]
     return json.dumps(all_links)
 
@@ -258,7 +381,7 @@ def get_params(project: str, job: str) -> str:
         project,
         job
     ]
-    params_output = _run_datastage_command(cmd)
+    params_output = _run_datastage_command(cmd, cacheable=True)
     all_params = [param.strip() for param in params_output.split('\n') if param.strip()]
     return json.dumps(all_params)
 
@@ -276,7 +399,7 @@ def get_invocations(project: str, job: str) -> str:
         project,
         job
     ]
-    invocations_output = _run_datastage_command(cmd)
+    invocations_output = _run_datastage_command(cmd, cacheable=True)
     all_invocations = [invocation.strip() for invocation in invocations_output.split('\n') if invocation.strip()]
     return json.dumps(all_invocations)
 
@@ -292,7 +415,7 @@ def get_queues() -> str:
         "-password", datastage_config.PASSWORD,
         "-lqueues"
     ]
-    queues_output = _run_datastage_command(cmd)
+    queues_output = _run_datastage_command(cmd, cacheable=True)
     all_queues = [queue.strip() for queue in queues_output.split('\n') if queue.strip()]
     return json.dumps(all_queues)
 
@@ -310,7 +433,7 @@ def get_job_info(project: str, job: str) -> str:
         project,
         job
     ]
-    job_info_output = _run_datastage_command(cmd)
+    job_info_output = _run_datastage_command(cmd, cacheable=True)
     return job_info_output
 
 def get_stage_info(project: str, job: str, stage: str) -> str:
@@ -328,7 +451,7 @@ def get_stage_info(project: str, job: str, stage: str) -> str:
         job,
         stage
     ]
-    stage_info_output = _run_datastage_command(cmd)
+    stage_info_output = _run_datastage_command(cmd, cacheable=True)
     return stage_info_output
 
 def get_link_info(project: str, job: str, stage: str, link: str) -> str:
@@ -347,7 +470,7 @@ def get_link_info(project: str, job: str, stage: str, link: str) -> str:
         stage,
         link
     ]
-    link_info_output = _run_datastage_command(cmd)
+    link_info_output = _run_datastage_command(cmd, cacheable=True)
     return link_info_output
 
 def get_parameter_info(project: str, job: str, param: str) -> str:
@@ -365,7 +488,7 @@ def get_parameter_info(project: str, job: str, param: str) -> str:
         job,
         param
     ]
-    parameter_info_output = _run_datastage_command(cmd)
+    parameter_info_output = _run_datastage_command(cmd, cacheable=True)
     return parameter_info_output
 
 def get_log_job(project: str, job: str) -> str:
@@ -382,7 +505,7 @@ def get_log_job(project: str, job: str) -> str:
         project,
         job
     ]
-    log_job_output = _run_datastage_command(cmd)
+    log_job_output = _run_datastage_command(cmd, cacheable=True)
     return log_job_output
 
 def get_report_job(project: str, job: str, report_type: str = "BASIC") -> str:
@@ -400,7 +523,7 @@ def get_report_job(project: str, job: str, report_type: str = "BASIC") -> str:
         job,
         report_type
     ]
-    report_output = _run_datastage_command(cmd)
+    report_output = _run_datastage_command(cmd, cacheable=True)
     return report_output
 
 
@@ -420,5 +543,5 @@ def get_jobs_uses(project: str, job: str) -> str:
         project,
         job
     ]
-    log_job_output = _run_datastage_command(cmd)
+    log_job_output = _run_datastage_command(cmd, cacheable=True)
     return log_job_output
@@ -0,0 +1,251 @@
+import contextvars
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import datastage_config # Import the configuration
+from .cache import _get_db_connection # The inventory lives in the same SQLite database as the cache
+from .admission import admission_controller, deadline, remaining
+from . import datastage
+
+# Keys of `dsjob -paraminfo` output mapped to inventory columns
+PARAMINFO_FIELDS = {
+    "type": "type",
+    "help text": "help_text",
+    "prompt": "prompt",
+    "default value": "default_value",
+}
+
+def init_inventory_db():
+    conn = _get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_inventory (
+            project TEXT,
+            job TEXT,
+            crawled_at REAL,
+            PRIMARY KEY (project, job)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_inventory (
+            project TEXT PRIMARY KEY,
+            started_at REAL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS param_inventory (
+            project TEXT COLLATE NOCASE,
+            job TEXT COLLATE NOCASE,
+            param TEXT COLLATE NOCASE,
+            param_set TEXT COLLATE NOCASE,
+            type TEXT,
+            default_value TEXT COLLATE NOCASE,
+            prompt TEXT,
+            help_text TEXT,
+            PRIMARY KEY (project, job, param)
+        )
+    """)
+    # Searches are case-insensitive, so the indexes must use NOCASE to be usable
+    for column in ("param", "default_value", "param_set", "job"):
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_param_{column}_nocase "
+            f"ON param_inventory ({column} COLLATE NOCASE)"
+        )
+    conn.commit()
+    conn.close()
+
+def parse_parameter_info(output: str) -> dict:
+    """Parses the `Key : Value` lines printed by `dsjob -paraminfo`."""
+    info = {column: None for column in PARAMINFO_FIELDS.values()}
+    for line in output.split('\n'):
+        if ':' not in line:
+            continue
+        key, value = line.split(':', 1)
+        column = PARAMINFO_FIELDS.get(key.strip().lower())
+        if column:
+            info[column] = value.strip()
+    return info
+
+def _parameter_set(param: str, param_type: str | None) -> str | None:
+    """Returns the parameter set a parameter belongs to, if any."""
+    if '.' in param:
+        return param.split('.', 1)[0]
+    if param_type and "set" in param_type.lower():
+        return param
+    return None
+
+def _deadline_exhausted() -> bool:
+    budget = remaining()
+    return budget is not None and budget <= 0
+
+def _crawl_job(project: str, job: str):
+    """
+    Reads every parameter of a job and replaces its rows in the inventory.
+
+    Must run under datastage.fresh_only(): a job is only recorded with data read
+    just now. Returns the number of parameters, or None if the crawl's deadline
+    ran out before the job was read completely.
+    """
+    if _deadline_exhausted():
+        return None
+    try:
+        params = json.loads(datastage.get_params(project, job))
+        rows = []
+        for param in params:
+            info = parse_parameter_info(datastage.get_parameter_info(project, job, param))
+            rows.append((project, job, param, _parameter_set(param, info['type']), info['type'],
+                         info['default_value'], info['prompt'], info['help_text']))
+    except datastage.DataStageError:
+        if _deadline_exhausted():
+            return None
+        raise
+
+    conn = _get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM param_inventory WHERE project = ? AND job = ?", (project, job))
+    cursor.executemany(
+        "INSERT INTO param_inventory "
+        "(project, job, param, param_set, type, default_value, prompt, help_text) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        rows
+    )
+    cursor.execute(
+        "INSERT OR REPLACE INTO job_inventory (project, job, crawled_at) VALUES (?, ?, ?)",
+        (project, job, time.time())
+    )
+    conn.commit()
+    conn.close()
+    return len(params)
+
+def _map_concurrently(func, items, workers):
+    """
+    Runs func over items in a thread pool and returns (item, result, error) tuples.
+    Each task runs in a copy of the caller's context (deadline, fresh_only).
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            (item, executor.submit(contextvars.copy_context().run, func, *item))
+            for item in items
+        ]
+        outcomes = []
+        for item, future in futures:
+            try:
+                outcomes.append((item, future.result(), None))
+            except Exception as e:
+                outcomes.append((item, None, e))
+        return outcomes
+
+def refresh_parameter_inventory(project: str = None, max_age: int = 0, max_seconds: float = None) -> str:
+    """
+    Builds or refreshes the local parameter inventory of a DataStage project.
+
+    Jobs crawled less than max_age seconds ago are skipped; every other job has
+    all its parameters re-read. Jobs are crawled oldest first and each one is
+    saved as soon as it finishes. A call runs for at most max_seconds
+    (DATASTAGE_REQUEST_TIMEOUT by default, and never past the MCP request
+    deadline); jobs not reached are reported as pending and the next call
+    continues the same pass, skipping jobs already read in it, so the caller
+    repeats it until pending is empty.
+
+    The crawl uses at most half of the current adaptive concurrency limit so
+    interactive tools keep the rest.
+    """
+    if project is None:
+        project = datastage_config.PROJECT
+    if max_seconds is None:
+        max_seconds = datastage_config.REQUEST_TIMEOUT
+    with deadline(max_seconds), datastage.fresh_only():
+        return _refresh_parameter_inventory(project, max_age)
+
+def _refresh_parameter_inventory(project: str, max_age: int) -> str:
+    jobs = json.loads(datastage.get_jobs(project))
+    now = time.time()
+
+    conn = _get_db_connection()
+    cursor = conn.cursor()
+    # Continue the pass left unfinished by a previous call, or start a new one
+    cursor.execute("SELECT started_at FROM crawl_inventory WHERE project = ?", (project,))
+    row = cursor.fetchone()
+    pass_started = row['started_at'] if row else now
+    cursor.execute(
+        "INSERT OR REPLACE INTO crawl_inventory (project, started_at) VALUES (?, ?)",
+        (project, pass_started)
+    )
+    cursor.execute("SELECT job, crawled_at FROM job_inventory WHERE project = ?", (project,))
+    crawled_at = {row['job']: row['crawled_at'] for row in cursor.fetchall()}
+    current_jobs = set(jobs)
+    removed = [job for job in crawled_at if job not in current_jobs]
+    for job in removed:
+        cursor.execute("DELETE FROM param_inventory WHERE project = ? AND job = ?", (project, job))
+        cursor.execute("DELETE FROM job_inventory WHERE project = ? AND job = ?", (project, job))
+    conn.commit()
+    conn.close()
+
+    to_crawl = [
+        (project, job)
+        for job in sorted(jobs, key=lambda job: crawled_at.get(job, 0))
+        if crawled_at.get(job, 0) < pass_started
+        and (not max_age or now - crawled_at.get(job, 0) >= max_age)
+    ]
+    updated, pending, failed = 0, [], []
+    workers = max(1, admission_controller.limiter.limit // 2)
+    for (_, job), result, error in _map_concurrently(_crawl_job, to_crawl, workers):
+        if error is not None:
+            failed.append({"job": job, "error": str(error)})
+        elif result is None:
+            # Not reached, or interrupted, before the deadline ran out
+            pending.append(job)
+        else:
+            updated += 1
+
+    conn = _get_db_connection()
+    cursor = conn.cursor()
+    if not pending:
+        cursor.execute("DELETE FROM crawl_inventory WHERE project = ?", (project,))
+        conn.commit()
+    cursor.execute("SELECT COUNT(*) FROM param_inventory WHERE project = ?", (project,))
+    total_params = cursor.fetchone()[0]
+    conn.close()
+
+    return json.dumps({
+        "project": project,
+        "jobs": len(jobs),
+        "skipped": len(jobs) - len(to_crawl),
+        "updated": updated,
+        "removed": len(removed),
+        "pending": pending,
+        "parameters": total_params,
+        "failed": failed,
+    }, indent=2)
+
+def find_parameters(project: str = None, job: str = None, name: str = None,
+                    default_value: str = None, param_set: str = None) -> str:
+    """
+    Searches the local parameter inventory.
+    Every filter is optional, case-insensitive and accepts the '%' wildcard (e.g. 'PS_DB%').
+    """
+    filters, values = [], []
+    for column, value in (("project", project), ("job", job), ("param", name),
+                          ("default_value", default_value), ("param_set", param_set)):
+        if value is not None:
+            if '%' in value:
+                filters.append(f"{column} LIKE ? ESCAPE '\\'")
+                values.append(value.replace('\\', '\\\\').replace('_', '\\_'))
+            else:
+                filters.append(f"{column} = ? COLLATE NOCASE")
+                values.append(value)
+    query = "SELECT project, job, param, param_set, type, default_value, prompt, help_text FROM param_inventory"
+    if filters:
+        query += " WHERE " + " AND ".join(filters)
+    query += " ORDER BY project, job, param"
+
+    conn = _get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(query, values)
+    rows = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return json.dumps(rows, indent=2)
+
+# Initialize the inventory tables when the module is imported
+init_inventory_db()